@@ -0,0 +1,74 @@
+import re
+import sys
+import argparse
+import subprocess
+from typing import Dict, Any, List
+
+
+ENTRY_POINTS = ["ama_main_api", "ama_main_voice", "ama_main_st"]
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str) -> Dict[str, Any]:
+    """Import `module` in a fresh interpreter under `-X importtime` and collect the timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({
+                "module": name,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": len(indent) // 2,
+            })
+
+    # children are reported before their parent, so the entry point's direct imports are
+    # the depth 1 lines between the previous top-level line and the entry point line.
+    entry, children = None, []
+    for i in imports:
+        if i["depth"] == 0:
+            if i["module"] == module:
+                entry = i
+                break
+            children = []
+        elif i["depth"] == 1:
+            children.append(i)
+
+    return {
+        "entry_point": module,
+        "ok": result.returncode == 0,
+        "total_ms": entry["cumulative_us"] / 1000 if entry else 0.0,
+        "modules": len(imports),
+        "children": children if entry else [],
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode != 0 and result.stderr.strip() else None,
+    }
+
+
+def report(results: List[Dict[str, Any]], top: int) -> None:
+    for result in results:
+        status = "ok" if result["ok"] else f"failed: {result['error']}"
+        print(f"{result['entry_point']}: {result['total_ms']:.1f}ms, {result['modules']} modules ({status})")
+
+        slowest = sorted(
+            result["children"],
+            key=lambda i: i["cumulative_us"],
+            reverse=True,
+        )[:top]
+        for i in slowest:
+            print(f"    {i['cumulative_us'] / 1000:8.1f}ms  {i['module']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold import time of each entry point.")
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest top-level imports to show")
+    args = parser.parse_args()
+
+    report([measure(module) for module in args.entry_points], args.top)
@@ -1,20 +1,24 @@
+import os
+import time
+import asyncio
 from fastapi import FastAPI, HTTPException, Header, Depends
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Dict, Any, List
 from dotty_dictionary import dotty
 
-from langchain_core.messages import HumanMessage, SystemMessage
 from core.logger import logger
 from core.config import Config
 from core.session.base import Session
 from core.session.backends.redis import RedisBackend
-from core.utilities import convert_to_langchain_messages
+from core.session.archive import SessionArchive
+from core.capture import TraceRecorder
+from core.scheduling import TurnClass, admission_controller
+from core.retrieval_cache import retrieval_cache, close_async_driver, current_smb_id, install_graph_query_cache
+from core.cache import caches, get_cache
+from core.availability import start_slot_index
 from fastapi.middleware.cors import CORSMiddleware
-
-from orchestration.workflow import create_primary_graph
-from orchestration.state import default_state
-from orchestration.schema import Node
+from fastapi.responses import JSONResponse
 
 app = FastAPI(root_path="/proxy/8000")
 
@@ -26,9 +30,21 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+session_archive = SessionArchive()
+trace_recorder = TraceRecorder()
+
+config_cache = get_cache("config", max_entries=1, ttl=float(os.getenv("CACHE_CONFIG_TTL", 300)))
+graph_cache = get_cache("graphs", max_entries=int(os.getenv("CACHE_GRAPHS_MAX", 64)), ttl=float(os.getenv("CACHE_GRAPHS_TTL", 900)))
+
 class UserInput(BaseModel):
     q: str
 
+def create_primary_graph(session: Session):
+    # LangChain/LangGraph and the LLM clients are loaded on the first turn, not at startup.
+    from orchestration.workflow import create_primary_graph as _create_primary_graph
+    install_graph_query_cache()
+    return _create_primary_graph(session=session)
+
 class Main:
     def __init__(self, session_id: str, smb_id: str) -> None:
         self.session_id = session_id
@@ -36,18 +52,21 @@ class Main:
         self.device = None
         self.AppConfig, self.config, self.context = self._initialize_config()
         self.session = self._initialize_session(self.session_id, self.smb_id, self.device)
+        session_archive.restore(self.session, self.session_id)
         self.app_context = self._initialize_app_context(self.AppConfig, self.session, self.session_id, self.smb_id)
         self.messages = self._initialize_messages(self.session)
 
+        from orchestration.state import default_state
         self.initial_state = default_state()
         self.initial_state["device"] = self.device
 
     @staticmethod
     def _initialize_config():
-        AppConfig = Config()
-        config = AppConfig.get_data()
-        context = AppConfig.get_context()
-        return AppConfig, config, context
+        def load():
+            AppConfig = Config()
+            return AppConfig, AppConfig.get_data(), AppConfig.get_context()
+
+        return config_cache.get_or_set("default", load)
 
     @staticmethod
     def _initialize_session(session_id: str, smb_id: str, device: str) -> Session:
@@ -73,17 +92,18 @@ class Main:
 
     @staticmethod
     def _initialize_app_context(AppConfig: Config, session: Session, session_id: str, smb_id: str) -> Dict[str, Any]:
-        app_context = AppConfig.load_app_context(visitor_session=session_id, smb_id=smb_id)
+        def load_app_context():
+            return AppConfig.load_app_context(visitor_session=session_id, smb_id=smb_id)
 
         try:
             stored_context = session.get_data("app_context")
             if stored_context is None:
-                stored_context = app_context.to_dict()
+                stored_context = load_app_context().to_dict()
                 session.set_data("app_context", stored_context)
             return dotty(stored_context)
         except Exception as e:
             logger.error(f"Failed to get or set app_context in session: {e}")
-            return app_context
+            return load_app_context()
 
     @staticmethod
     def _initialize_messages(session: Session) -> List[Dict[str, Any]]:
@@ -94,6 +114,13 @@ class Main:
             return []
 
     async def processing_request(self, user_input):
+        from langchain_core.messages import HumanMessage
+        from core.utilities import convert_to_langchain_messages
+        from orchestration.schema import Node
+
+        # knowledge graph reads of this turn are cached under the visitor's SMB.
+        current_smb_id.set(self.smb_id)
+
         agent_config = {
             "configurable": {
                 "thread_id": "t-" + self.session_id,
@@ -101,7 +128,18 @@ class Main:
             "recursion_limit": 150
         }
 
-        agent = create_primary_graph(session=self.session)
+        # record each LLM output so a replay can hand them back in place of the model.
+        llm_recorder = None
+        if trace_recorder.enabled:
+            from core.llm_capture import LLMCallRecorder
+            llm_recorder = LLMCallRecorder()
+            agent_config["callbacks"] = [llm_recorder]
+
+        # compiled graphs are reused per session only when the graph keeps no per-run state.
+        if os.getenv("CACHE_GRAPHS", "false").lower() == "true":
+            agent = graph_cache.get_or_set(self.session_id, lambda: create_primary_graph(session=self.session))
+        else:
+            agent = create_primary_graph(session=self.session)
 
         messages = []
         ext_messages = []
@@ -115,10 +153,24 @@ class Main:
 
         content = ""
         debug_info = []
+        node_timings = []
+        started = last_update = time.perf_counter()
         async for s in agent.astream(input_state, config=agent_config, stream_mode="updates", debug=True):
             debug_info.append(s)
             the_keys = list(s.keys())
 
+            if trace_recorder.enabled:
+                now = time.perf_counter()
+                node_output = list(s.values())[0] or {}
+                node_messages = node_output.get("messages", []) if isinstance(node_output, dict) else []
+                node_timings.append({
+                    "node": the_keys[0] if the_keys else None,
+                    "elapsed_ms": round((now - last_update) * 1000, 2),
+                    "content": node_messages[-1].content if node_messages else "",
+                    "data": node_output.get("data", []) if isinstance(node_output, dict) else [],
+                })
+                last_update = now
+
             if Node.GENERATOR.value in the_keys or Node.AUTHORIZATION.value in the_keys or Node.VOIP.value in the_keys or Node.INITIATOR.value in the_keys or Node.ROUTER.value in the_keys or Node.FOLLOW_UP.value in the_keys:
                 actor = 'ai'
                 the_response = list(s.values())[0]
@@ -147,7 +199,18 @@ class Main:
                     if 'followup_message' in the_response and the_response["followup_message"].strip():
                         response["followup_message"] = the_response["followup_message"]
 
-                    self.session.push("messages", response)
+                    session_archive.push(self.session, self.session_id, "messages", response)
+
+        trace_recorder.record(
+            source="chat",
+            session_id=self.session_id,
+            smb_id=self.smb_id,
+            user_input=user_input,
+            nodes=node_timings,
+            output=content,
+            total_ms=(time.perf_counter() - started) * 1000,
+            llm_calls=llm_recorder.calls if llm_recorder else None,
+        )
 
         return content, debug_info
 
@@ -159,20 +222,33 @@ class Main:
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
 
-            self.session.push("messages", message)
+            session_archive.push(self.session, self.session_id, "messages", message)
 
             response_content, debug_info = await self.processing_request(user_input)
             return response_content, debug_info
         return None, None
 
     @staticmethod
-    def _cleanup_session(session: Session):
+    def _cleanup_session(session: Session, session_id: str):
         try:
             session.set_data("last_access", datetime.now().isoformat())
+            session_archive.touch(session_id)
+            session_archive.compact(session, session_id)
+            session_archive.expire(session_id)
         except Exception as e:
             logger.error(f"Failed to update session on exit: {str(e)}")
 
 
+@app.on_event("startup")
+async def start_session_archival():
+    session_archive.start_sweeper()
+
+@app.on_event("startup")
+async def start_calendar_slots():
+    # free slots are kept in memory and refreshed in the background for the appointment turns.
+    _, config, _ = Main._initialize_config()
+    start_slot_index(config["calendar"])
+
 
 async def verify_headers(
     x_session_key: str = Header(None, alias="x-session-key"),
@@ -182,6 +258,11 @@ async def verify_headers(
         raise HTTPException(status_code=401, detail="Unauthorized: Missing required headers")
     return {"x_session_key": x_session_key, "x_smb_key": x_smb_key}
 
+async def verify_admin(x_admin_key: str = Header(None, alias="x-admin-key")):
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key or x_admin_key != admin_key:
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid admin key")
+
 @app.post("/chat-completion")
 async def chat(
     user_input: UserInput,
@@ -189,18 +270,57 @@ async def chat(
 ):
     visitor_session = headers["x_session_key"]
     smb_id_from_header = headers["x_smb_key"]
-    main = Main(session_id=visitor_session, smb_id=smb_id_from_header)
-    main.session.set_data("smb_id", smb_id_from_header)
-
-    try:
-        response, debug_info = await main.run(user_input.q)
-
-        if not response:
-            return {"error": "Failed to process the request.", "data": None}
-        return {"data": response, "error": None, "debug_info": debug_info}
-    except Exception as e:
-        logger.exception(f"Error in chat completion: {str(e)}")
-        return {"error": str(e), "data": None}
+
+    # admit before any session work so a saturated pool answers immediately.
+    async with admission_controller.admit(TurnClass.CHAT) as admitted:
+        if not admitted:
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Assistant is busy, please try again shortly.", "data": None},
+            )
+
+        # session setup does blocking Redis and archive I/O, keep it off the event loop.
+        main = await asyncio.to_thread(Main, session_id=visitor_session, smb_id=smb_id_from_header)
+        main.session.set_data("smb_id", smb_id_from_header)
+
+        try:
+            response, debug_info = await main.run(user_input.q)
+
+            if not response:
+                return {"error": "Failed to process the request.", "data": None}
+            return {"data": response, "error": None, "debug_info": debug_info}
+        except Exception as e:
+            logger.exception(f"Error in chat completion: {str(e)}")
+            return {"error": str(e), "data": None}
+        finally:
+            await asyncio.to_thread(Main._cleanup_session, main.session, visitor_session)
+
+@app.on_event("shutdown")
+async def close_knowledge_graph():
+    await close_async_driver()
+
+@app.post("/knowledge-base/invalidate", dependencies=[Depends(verify_admin)])
+async def invalidate_knowledge_base(smb_id: str):
+    retrieval_cache.invalidate(smb_id)
+    return {"data": retrieval_cache.get_stats(), "error": None}
+
+@app.get("/admin/caches", dependencies=[Depends(verify_admin)])
+async def cache_stats():
+    return {"data": caches.get_stats(), "error": None}
+
+@app.delete("/admin/caches", dependencies=[Depends(verify_admin)])
+async def flush_caches(name: str = None):
+    if name is not None and name not in caches.names():
+        raise HTTPException(status_code=404, detail=f"Unknown cache: {name}")
+    return {"data": caches.flush(name), "error": None}
+
+@app.get("/stats/archive", dependencies=[Depends(verify_admin)])
+async def archive_stats():
+    return {"data": session_archive.get_stats(), "error": None}
+
+@app.get("/stats/admission", dependencies=[Depends(verify_admin)])
+async def admission_stats():
+    return {"data": await admission_controller.get_stats(), "error": None}
 
 @app.get("/")
 async def read_root():
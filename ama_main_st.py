@@ -3,7 +3,6 @@ import asyncio
 import traceback
 
 import streamlit as st
-from langchain_core.messages import HumanMessage 
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -11,20 +10,18 @@ from typing import Dict, Any, List
 
 from core.logger import logger
 from core.config import Config
-from core.greetings import GreetingPipeline
-from core.utilities import convert_to_langchain_messages
 from core.session.backends.redis import RedisBackend
 from core.session.base import Session
+from core.session.archive import SessionArchive
 from core.ux.components import (
     MessageResponse, local_css, display_message, display_history, display_input,
     SelectorConfig, create_selector, display_entity_details, format_entity_name,
     create_message_container, clear_messages, add_message
 )
 from core.handlers.db import get_active_smbs, get_visitors
-
-from orchestration.state import default_state
-from orchestration.workflow import create_primary_graph
-from orchestration.schema import Node
+from core.cache import get_cache
+from core.scheduling import TurnClass, admission_controller
+from core.retrieval_cache import current_smb_id, install_graph_query_cache
 
 
 # Load environment variables
@@ -32,6 +29,11 @@ load_dotenv(
     override=True
 )
 
+session_archive = SessionArchive()
+session_archive.start_sweeper()
+config_cache = get_cache("config", max_entries=1, ttl=float(os.getenv("CACHE_CONFIG_TTL", 300)))
+greeting_cache = get_cache("greetings", max_entries=256, ttl=float(os.getenv("CACHE_GREETING_TTL", 600)))
+
 class Main():
 
     def __init__(self):
@@ -46,16 +48,21 @@ class Main():
             self.smb_id = None
             self.device = None
         
-        self.AppConfig = Config()
-        self.config = self.AppConfig.get_data()
+        self.AppConfig, self.config = self._initialize_config()
         self.session = self._initialize_session(self.session_id, self.smb_id, self.device)
         
-        self.initial_state = default_state()
-        self.initial_state["device"] = self.device
-        
         self.messages = self._initialize_messages(self.session)
         self.messages_container = None
 
+    @staticmethod
+    def _initialize_config():
+        # Streamlit builds Main on every rerun; the parsed config is shared between reruns.
+        def load():
+            AppConfig = Config()
+            return AppConfig, AppConfig.get_data()
+
+        return config_cache.get_or_set("default", load)
+
     @staticmethod
     def _enabled_langsmith():
         os.environ["LANGCHAIN_TRACING_V2"] = os.getenv('LANGCHAIN_TRACING_V2', "true")
@@ -76,6 +83,10 @@ class Main():
             }
         
             session.set_data("session", session_data)
+
+            # bring back history archived while the visitor was idle.
+            if session_id:
+                session_archive.restore(session, session_id)
             return session
         
         except Exception as e:
@@ -94,6 +105,16 @@ class Main():
             return []
         
     async def processing_request(self, user_input):
+        # the graph stack is loaded on the first turn, not on every page render.
+        from langchain_core.messages import HumanMessage
+        from core.utilities import convert_to_langchain_messages
+        from orchestration.workflow import create_primary_graph
+        from orchestration.schema import Node
+        from orchestration.state import default_state
+
+        install_graph_query_cache()
+        current_smb_id.set(self.smb_id)
+
         try:
             # Validate input
             if not user_input or not user_input.strip():
@@ -117,7 +138,8 @@ class Main():
             else:
                 ext_messages = [HumanMessage(content=user_input)]
             
-            input_state = self.initial_state
+            input_state = default_state()
+            input_state["device"] = self.device
             input_state["messages"] = ext_messages
             
             # Add timeout to prevent hanging
@@ -158,7 +180,7 @@ class Main():
                                     if 'followup_message' in the_response['generator_state'] and the_response["generator_state"]["followup_message"].strip():
                                         response["followup_message"] = the_response["generator_state"]["followup_message"]
                                     
-                                self.session.push("messages", response)
+                                session_archive.push(self.session, self.session_id, "messages", response)
                                 display_message(MessageResponse(response), container=self.messages_container)
                                 
             except asyncio.TimeoutError:
@@ -168,7 +190,7 @@ class Main():
                     "content": "I apologize, but the request is taking too long to process. Please try again with a simpler request.",
                     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
-                self.session.push("messages", error_response)
+                session_archive.push(self.session, self.session_id, "messages", error_response)
                 display_message(MessageResponse(error_response), container=self.messages_container)
                 
         except Exception as e:
@@ -180,7 +202,7 @@ class Main():
                 "content": "I apologize, but an error occurred while processing your request. Please try again.",
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
-            self.session.push("messages", error_response)
+            session_archive.push(self.session, self.session_id, "messages", error_response)
             display_message(MessageResponse(error_response), container=self.messages_container)
         
     async def run(self):
@@ -300,7 +322,11 @@ class Main():
                                         st.session_state["messages_displayed"] = True
                                         # breakpoint()
                                 else:
-                                    content = await GreetingPipeline.greeting(session_id=self.session_id)
+                                    content = greeting_cache.get(self.session_id)
+                                    if content is None:
+                                        from core.greetings import GreetingPipeline
+                                        content = await GreetingPipeline.greeting(session_id=self.session_id)
+                                        greeting_cache.set(self.session_id, content)
 
                                     welcome_msg = add_message(
                                         messages=self.messages,
@@ -352,7 +378,23 @@ class Main():
             
             try:
                 logger.info("\n\n\n ------------------------------------------------------------------------------Processing request...------------------------------------------------------------------------------ \n\n\n")
-                await self.processing_request(user_input)
+                # Streamlit turns share the LLM pool with the API and voice, behind voice.
+                async with admission_controller.admit(TurnClass.CHAT) as admitted:
+                    if admitted:
+                        await self.processing_request(user_input)
+                    else:
+                        busy_msg = add_message(
+                            messages=self.messages,
+                            content="Assistant is busy, please try again shortly.",
+                            role="system"
+                        )
+                        self.session.set_data("messages", self.messages)
+                        display_message(MessageResponse(busy_msg), container=self.messages_container)
+
+                if self.session_id:
+                    await asyncio.to_thread(session_archive.touch, self.session_id)
+                    await asyncio.to_thread(session_archive.compact, self.session, self.session_id)
+                    await asyncio.to_thread(session_archive.expire, self.session_id)
 
             except Exception as e:
                 logger.exception(e)
@@ -1,4 +1,5 @@
 import os
+import time
 import asyncio
 import json
 import traceback
@@ -10,6 +11,10 @@ from livekit.agents import (
     Agent, 
     RoomInputOptions, 
     ConversationItemAddedEvent,
+    MetricsCollectedEvent,
+    UserStateChangedEvent,
+    AgentStateChangedEvent,
+    metrics,
 
 )
 
@@ -18,27 +23,40 @@ from livekit.plugins import (
 )
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
-from core.greetings import GreetingPipeline
 from core.logger import logger
 from core.session.base import Session
 from core.session.backends.redis import RedisBackend
-from core.handlers.utility_api import UtilityAPI
-from core.utilities import format_message, format_conversation_item
+from core.session.archive import SessionArchive
+from core.capture import TraceRecorder
+from core.cache import get_cache
+from core.scheduling import TurnClass, admission_controller
+from core.retrieval_cache import current_smb_id, install_graph_query_cache
+from core.availability import start_slot_index
 
-from orchestration.workflow import create_primary_graph
-
-from voice.chains import BasicChain
-from voice.setup import initialize_tts, default_initialization
+from voice.setup import default_initialization
 
 from dotenv import load_dotenv
 load_dotenv()
 
 
+session_archive = SessionArchive()
+trace_recorder = TraceRecorder()
+greeting_cache = get_cache("greetings", max_entries=256, ttl=float(os.getenv("CACHE_GREETING_TTL", 600)))
+
+
 class Assistant(Agent):
     def __init__(self) -> None:
         super().__init__(instructions="You are a helpful voice AI assistant.")
 
 
+class ScheduledAgent(Agent):
+    # voice turns take a slot from the LLM pool shared with the API, ahead of chat turns.
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        async with admission_controller.admit(TurnClass.VOICE):
+            async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+                yield chunk
+
+
 def _initialize_session(session_id: str, smb_id: str, device: str) -> Session:
     session = Session(RedisBackend())
     session.set_session_id(session_id)
@@ -95,8 +113,32 @@ async def send_data_to_participant(ctx, participant, data: Dict[str, Any]):
         logger.error(f"[PARTICIPANT] Error in send_data_to_participant: {e}")
         logger.error(traceback.format_exc())
 
+def prewarm(proc: agents.JobProcess):
+    default_initialization(proc)
+    session_archive.start_sweeper()
+
+    from core.config import Config
+    start_slot_index(Config().get_data()["calendar"])
+
+    # load the graph stack while the job process is idle, not on the call's connect path.
+    # the worker supervisor never runs this, so it still starts without it.
+    import core.greetings  # noqa: F401
+    import core.handlers.utility_api  # noqa: F401
+    import core.utilities  # noqa: F401
+    import orchestration.workflow  # noqa: F401
+    import voice.chains  # noqa: F401
+    install_graph_query_cache()
+
+
 async def entrypoint(ctx: agents.JobContext):
 
+    # already imported by prewarm, these are module cache lookups.
+    from core.greetings import GreetingPipeline
+    from core.handlers.utility_api import UtilityAPI
+    from core.utilities import format_conversation_item
+    from orchestration.workflow import create_primary_graph
+    from voice.chains import BasicChain
+
     logger.debug("Starting entrypoint...")
 
     # user input transcribed.
@@ -106,6 +148,7 @@ async def entrypoint(ctx: agents.JobContext):
     # define required variables.
     the_device = 'ew'
     the_session_id = None
+    the_smb_id = None
     the_session = None
     session = None  # Initialize session variable
 
@@ -132,6 +175,7 @@ async def entrypoint(ctx: agents.JobContext):
             smb_id = participant_attributes.get("smb_id")
             
             the_session_id = session_id
+            the_smb_id = smb_id
             the_session = _initialize_session(session_id, smb_id, the_device)
                     
         if "sip.phoneNumber" in participant_attributes and "sip.trunkPhoneNumber" in participant_attributes:
@@ -147,6 +191,7 @@ async def entrypoint(ctx: agents.JobContext):
             if result and result["success"]:
                 data = result["data"]
                 the_session_id = data["session_id"]
+                the_smb_id = data["smb_id"]
                 the_device = os.getenv('DEVICE_VOIP')
                 the_session = _initialize_session(the_session_id, data["smb_id"], the_device)
             else:
@@ -154,12 +199,30 @@ async def entrypoint(ctx: agents.JobContext):
     
     if the_session:
 
+        # knowledge graph reads of this call are cached under the resolved SMB.
+        current_smb_id.set(the_smb_id)
+
+        # bring back archived history and cap it again when the call ends.
+        await asyncio.to_thread(session_archive.restore, the_session, the_session_id)
+
+        async def _cleanup_session():
+            try:
+                await asyncio.to_thread(session_archive.touch, the_session_id)
+                await asyncio.to_thread(session_archive.compact, the_session, the_session_id)
+                await asyncio.to_thread(session_archive.expire, the_session_id)
+            except Exception as e:
+                logger.error(f"[ARCHIVE] Failed to compact session on exit: {e}")
+
+        ctx.add_shutdown_callback(_cleanup_session)
+
         logger.debug("Creating AgentSession...")
 
         openai_api_key = os.getenv("OPENAI_API_KEY")
         initial_state = ctx.proc.userdata["initial_state"]
         initial_state["device"] = the_device      
         
+        # no speculative runs: the graph is the LLM here and includes the booking tools, so a
+        # discarded run could still book. see the turn metrics below for the latency baseline.
         session = AgentSession(
             stt=ctx.proc.userdata["stt"],
             tts=ctx.proc.userdata["tts"],
@@ -168,6 +231,73 @@ async def entrypoint(ctx: agents.JobContext):
         )
         logger.debug("AgentSession created...")
 
+        # per call latency metrics.
+        call_metrics = {
+            "turns": 0,
+            "end_of_utterance_delay": 0.0,
+            "llm_runs": 0,
+            "llm_cancelled": 0,
+            "llm_ttft": 0.0,
+            "first_audio": [],
+        }
+        # wall clock time the user last stopped speaking, cleared when they speak again.
+        turn_timing = {"user_stopped": None}
+
+        @session.on("user_state_changed")
+        def _user_state_changed(ev: UserStateChangedEvent):
+            if ev.new_state == "speaking":
+                turn_timing["user_stopped"] = None
+            elif ev.old_state == "speaking":
+                turn_timing["user_stopped"] = time.perf_counter()
+
+        @session.on("agent_state_changed")
+        def _agent_state_changed(ev: AgentStateChangedEvent):
+            # time to first audio: user stopped speaking -> agent starts speaking.
+            # replies without a preceding user turn (the greeting) are not counted.
+            if ev.new_state != "speaking" or turn_timing["user_stopped"] is None:
+                return
+            first_audio = time.perf_counter() - turn_timing["user_stopped"]
+            turn_timing["user_stopped"] = None
+            call_metrics["first_audio"].append(first_audio)
+            logger.info(f"[METRICS] session={the_session_id} time_to_first_audio={first_audio:.3f}s")
+
+        @session.on("metrics_collected")
+        def _metrics_collected(ev: MetricsCollectedEvent):
+            the_metrics = ev.metrics
+
+            if isinstance(the_metrics, metrics.EOUMetrics):
+                call_metrics["turns"] += 1
+                call_metrics["end_of_utterance_delay"] += the_metrics.end_of_utterance_delay
+            elif isinstance(the_metrics, metrics.LLMMetrics):
+                # a cancelled run is a reply the user interrupted.
+                if getattr(the_metrics, "cancelled", False):
+                    call_metrics["llm_cancelled"] += 1
+                    return
+                if the_metrics.ttft <= 0:
+                    return
+                call_metrics["llm_runs"] += 1
+                call_metrics["llm_ttft"] += the_metrics.ttft
+
+        async def _log_call_metrics():
+            turns = call_metrics["turns"] or 1
+            llm_runs = call_metrics["llm_runs"] or 1
+            first_audio = call_metrics["first_audio"]
+
+            logger.info(
+                f"[METRICS] session={the_session_id} "
+                f"turns={call_metrics['turns']} "
+                f"llm_runs={call_metrics['llm_runs']} llm_cancelled={call_metrics['llm_cancelled']} "
+                f"avg_eou_delay={call_metrics['end_of_utterance_delay'] / turns:.3f}s "
+                f"avg_llm_ttft={call_metrics['llm_ttft'] / llm_runs:.3f}s "
+                f"avg_time_to_first_audio={(sum(first_audio) / len(first_audio)) if first_audio else 0.0:.3f}s "
+                f"max_time_to_first_audio={max(first_audio, default=0.0):.3f}s"
+            )
+
+        ctx.add_shutdown_callback(_log_call_metrics)
+
+        # pending user turn for trace capture.
+        pending_turn = {}
+
         # conversation item added. [+]
         @session.on("conversation_item_added")
         def _conversation_item_added(ev: ConversationItemAddedEvent):
@@ -203,9 +333,26 @@ async def entrypoint(ctx: agents.JobContext):
                     # clear followup message.
                     session._agent.llm.set_followup_message("")
 
+            # capture the turn: user input -> assistant reply.
+            if trace_recorder.enabled:
+                if ev.item.role == "user":
+                    pending_turn["input"] = ev.item.text_content or ""
+                    pending_turn["started"] = time.perf_counter()
+                elif ev.item.role == "assistant" and "started" in pending_turn:
+                    elapsed_ms = (time.perf_counter() - pending_turn.pop("started")) * 1000
+                    trace_recorder.record(
+                        source="voice",
+                        session_id=the_session_id,
+                        smb_id=the_smb_id,
+                        user_input=pending_turn.pop("input", ""),
+                        nodes=[],
+                        output=ev.item.text_content or "",
+                        total_ms=elapsed_ms,
+                    )
+
             # Push messages to session with error handling
             try:
-                the_session.push("messages", the_message)
+                session_archive.push(the_session, the_session_id, "messages", the_message)
             except Exception as e:
                 logger.error(f"[AGENT] Failed to push message to session: {e}")
 
@@ -223,7 +370,7 @@ async def entrypoint(ctx: agents.JobContext):
         )
 
         # create the agent.
-        agent = Agent(
+        agent = ScheduledAgent(
             instructions="",
             llm=chain,
         )
@@ -243,7 +390,10 @@ async def entrypoint(ctx: agents.JobContext):
         history = session.history.to_dict()
         if "items" in history and len(history["items"]) == 0:
             # greeting = f"Greet to user (include name if there) and introduce yourself!"
-            greeting = await GreetingPipeline.greeting(session_id=the_session_id)
+            greeting = greeting_cache.get(the_session_id)
+            if greeting is None:
+                greeting = await GreetingPipeline.greeting(session_id=the_session_id)
+                greeting_cache.set(the_session_id, greeting)
 
             message = greeting["messages"]
             await session.say(message, allow_interruptions=False)
@@ -256,6 +406,6 @@ if __name__ == "__main__":
     agents.cli.run_app(
         agents.WorkerOptions(
             entrypoint_fnc=entrypoint,
-            prewarm_fnc=default_initialization,
+            prewarm_fnc=prewarm,
         )
     )
\ No newline at end of file
@@ -0,0 +1,227 @@
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_openai.chat_models.base import BaseChatOpenAI
+
+from core.logger import logger
+from core.capture import load_traces
+
+import ama_main_api
+
+
+current_turn: contextvars.ContextVar = contextvars.ContextVar("current_turn")
+
+
+class RecordedTurn:
+    """
+    LLM outputs captured for one turn, handed back to the graph in call order.
+
+    The graph itself runs for real; only the chat model is replaced. Each call waits for
+    the recorded LLM latency (scaled by `speed`) before returning the recorded message.
+    Turns captured without LLM outputs (voice) answer every call with the final output.
+    """
+
+    def __init__(self, trace: Dict[str, Any], speed: float = 1.0) -> None:
+        self.calls = deque(trace.get("llm_calls") or [])
+        self.output = trace.get("output") or ""
+        self.elapsed_ms = trace.get("total_ms", 0) if not self.calls else 0
+        self.speed = speed
+        self.unmatched = 0
+
+    def next(self) -> Tuple[AIMessage, float]:
+        if self.calls:
+            call = self.calls.popleft()
+            message = messages_from_dict([call["message"]])[0]
+            return message, call.get("elapsed_ms", 0) / 1000 * self.speed
+
+        # more calls than were recorded: the graph took a different path this time.
+        self.unmatched += 1
+        elapsed_ms, self.elapsed_ms = self.elapsed_ms, 0
+        return AIMessage(content=self.output), elapsed_ms / 1000 * self.speed
+
+
+def _to_chunk(message: AIMessage) -> AIMessageChunk:
+    return AIMessageChunk(
+        content=message.content,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        tool_call_chunks=[
+            {"name": call["name"], "args": json.dumps(call["args"]), "id": call.get("id"), "index": i}
+            for i, call in enumerate(getattr(message, "tool_calls", None) or [])
+        ],
+    )
+
+
+async def _replay_agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+    message, delay = current_turn.get().next()
+    await asyncio.sleep(delay)
+    return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _replay_generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+    message, delay = current_turn.get().next()
+    time.sleep(delay)
+    return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+async def _replay_astream(self, messages, stop=None, run_manager=None, **kwargs):
+    message, delay = current_turn.get().next()
+    await asyncio.sleep(delay)
+    yield ChatGenerationChunk(message=_to_chunk(message))
+
+
+def _replay_stream(self, messages, stop=None, run_manager=None, **kwargs):
+    message, delay = current_turn.get().next()
+    time.sleep(delay)
+    yield ChatGenerationChunk(message=_to_chunk(message))
+
+
+@contextmanager
+def stubbed_llm():
+    """Swap the OpenAI chat model calls for the recorded outputs of the current turn."""
+    originals = {
+        name: getattr(BaseChatOpenAI, name)
+        for name in ("_agenerate", "_generate", "_astream", "_stream")
+    }
+    BaseChatOpenAI._agenerate = _replay_agenerate
+    BaseChatOpenAI._generate = _replay_generate
+    BaseChatOpenAI._astream = _replay_astream
+    BaseChatOpenAI._stream = _replay_stream
+    try:
+        yield
+    finally:
+        for name, method in originals.items():
+            setattr(BaseChatOpenAI, name, method)
+
+
+def group_by_session(traces: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group traces into conversations, each in the order its turns were captured."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for index, trace in enumerate(traces):
+        trace = {**trace, "index": index}
+        groups.setdefault(trace.get("session") or f"turn-{index}", []).append(trace)
+    return [sorted(turns, key=lambda t: (t.get("timestamp") or "", t["index"])) for turns in groups.values()]
+
+
+async def replay_turn(session_id: str, trace: Dict[str, Any], live: bool, speed: float) -> Dict[str, Any]:
+    turn = RecordedTurn(trace, speed=speed)
+    if not live:
+        current_turn.set(turn)
+    smb_id = trace.get("smb_id") or "replay"
+
+    started = time.perf_counter()
+    try:
+        main = await asyncio.to_thread(ama_main_api.Main, session_id=session_id, smb_id=smb_id)
+        try:
+            await main.run(trace["input"])
+        finally:
+            await asyncio.to_thread(ama_main_api.Main._cleanup_session, main.session, session_id)
+        error = None
+    except Exception as e:
+        logger.error(f"[REPLAY] Trace {trace['index']} failed: {e}")
+        error = str(e)
+
+    return {
+        "index": trace["index"],
+        "recorded_ms": trace.get("total_ms", 0),
+        "replayed_ms": (time.perf_counter() - started) * 1000,
+        "unmatched_llm_calls": 0 if live else turn.unmatched,
+        "error": error,
+    }
+
+
+async def replay_conversation(
+    run_id: str,
+    turns: List[Dict[str, Any]],
+    semaphore: asyncio.Semaphore,
+    live: bool,
+    speed: float,
+) -> List[Dict[str, Any]]:
+    # every turn of a conversation shares one session, so history builds up as in production.
+    session_id = f"replay-{run_id}-{turns[0]['index']}"
+    async with semaphore:
+        results = []
+        try:
+            for trace in turns:
+                results.append(await replay_turn(session_id, trace, live, speed))
+        finally:
+            try:
+                await asyncio.to_thread(ama_main_api.session_archive.purge, session_id)
+            except Exception as e:
+                logger.error(f"[REPLAY] Failed to clean up session {session_id}: {e}")
+        return results
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(results: List[Dict[str, Any]], wall_ms: float) -> Dict[str, Any]:
+    ok = [r for r in results if r["error"] is None]
+    recorded = [r["recorded_ms"] for r in ok]
+    replayed = [r["replayed_ms"] for r in ok]
+    return {
+        "turns": len(results),
+        "errors": len(results) - len(ok),
+        "unmatched_llm_calls": sum(r["unmatched_llm_calls"] for r in results),
+        "wall_ms": round(wall_ms, 2),
+        "recorded_p50_ms": round(_percentile(recorded, 50), 2),
+        "recorded_p95_ms": round(_percentile(recorded, 95), 2),
+        "replayed_p50_ms": round(_percentile(replayed, 50), 2),
+        "replayed_p95_ms": round(_percentile(replayed, 95), 2),
+        "replayed_mean_ms": round(statistics.mean(replayed), 2) if replayed else 0.0,
+    }
+
+
+async def replay(path: str, concurrency: int, source: Optional[str] = None, live: bool = False, speed: float = 1.0):
+    traces = load_traces(path, source=source)
+    conversations = group_by_session(traces)
+    logger.info(f"[REPLAY] Loaded {len(traces)} traces ({len(conversations)} conversations) from {path}")
+
+    # replayed turns must not be captured again.
+    ama_main_api.trace_recorder.path = None
+
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def run_all():
+        return await asyncio.gather(*[
+            replay_conversation(run_id, turns, semaphore, live, speed) for turns in conversations
+        ])
+
+    if live:
+        grouped = await run_all()
+    else:
+        with stubbed_llm():
+            grouped = await run_all()
+
+    results = sorted((r for group in grouped for r in group), key=lambda r: r["index"])
+    summary = summarize(results, (time.perf_counter() - started) * 1000)
+    logger.info(f"[REPLAY] Summary: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured turn traces through the chat pipeline.")
+    parser.add_argument("path", help="JSONL trace file written with CAPTURE_TRACE_PATH")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conversations replayed at the same time")
+    parser.add_argument("--source", choices=["chat", "voice"], default=None)
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplier for recorded LLM latencies")
+    parser.add_argument("--live", action="store_true", help="Call the real LLM instead of replaying recorded outputs")
+    args = parser.parse_args()
+
+    asyncio.run(replay(args.path, args.concurrency, source=args.source, live=args.live, speed=args.speed))
@@ -0,0 +1,230 @@
+import os
+import bisect
+import threading
+from datetime import datetime, date, time, timedelta
+from typing import Dict, Any, List, Tuple, Optional
+from zoneinfo import ZoneInfo
+
+from core.logger import logger
+
+
+Interval = Tuple[datetime, datetime]
+
+
+class FakeCalendar:
+    """In-memory calendar with the same busy-lookup interface, for offline use and tests."""
+
+    def __init__(self, busy: List[Interval] = None) -> None:
+        self.busy = list(busy or [])
+
+    def get_busy(self, start: datetime, end: datetime) -> List[Interval]:
+        return [(s, e) for s, e in self.busy if s < end and e > start]
+
+    def book(self, start: datetime, end: datetime) -> None:
+        self.busy.append((start, end))
+
+
+class GoogleCalendarBusy:
+    """Busy lookup backed by the Google Calendar freebusy API."""
+
+    def __init__(self, service, calendar_id: str) -> None:
+        self.service = service
+        self.calendar_id = calendar_id
+
+    def get_busy(self, start: datetime, end: datetime) -> List[Interval]:
+        result = self.service.freebusy().query(body={
+            "timeMin": start.isoformat(),
+            "timeMax": end.isoformat(),
+            "items": [{"id": self.calendar_id}],
+        }).execute()
+
+        busy = result.get("calendars", {}).get(self.calendar_id, {}).get("busy", [])
+        return [
+            (datetime.fromisoformat(b["start"].replace("Z", "+00:00")),
+             datetime.fromisoformat(b["end"].replace("Z", "+00:00")))
+            for b in busy
+        ]
+
+
+class SlotIndex:
+    """
+    Sorted index of free appointment slots for one calendar over the next `days_ahead` days.
+
+    Slots are derived from the calendar `availability` and `slot_duration` in config.json
+    minus the busy intervals reported by `calendar`. `refresh()` patches only the days
+    whose slots changed; `book()` removes a slot immediately and keeps it out of later
+    refreshes until the calendar itself reports the booking.
+    """
+
+    def __init__(self, calendar_config: Dict[str, Any], calendar, days_ahead: int = None) -> None:
+        availability = calendar_config["availability"]
+        self.calendar = calendar
+        self.days_ahead = days_ahead if days_ahead is not None else int(os.getenv("CALENDAR_SLOT_DAYS", 14))
+        self.timezone = ZoneInfo(calendar_config.get("timezone", "UTC"))
+        self.slot_duration = timedelta(minutes=calendar_config.get("slot_duration", 60))
+        self.day_start = time.fromisoformat(availability["start"])
+        self.day_end = time.fromisoformat(availability["end"])
+        self.days = set(availability.get("days", []))
+
+        self._slots: List[datetime] = []
+        self._days: Dict[date, List[datetime]] = {}
+        self._pending: Dict[datetime, datetime] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.refreshed_at: Optional[datetime] = None
+
+    def _now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    def _normalize(self, value: datetime) -> datetime:
+        # naive datetimes are taken as calendar local time.
+        if value.tzinfo is None:
+            return value.replace(tzinfo=self.timezone)
+        return value.astimezone(self.timezone)
+
+    def _day_slots(self, day: date, busy: List[Interval]) -> List[datetime]:
+        if day.strftime("%A") not in self.days:
+            return []
+
+        slots = []
+        start = datetime.combine(day, self.day_start, tzinfo=self.timezone)
+        day_end = datetime.combine(day, self.day_end, tzinfo=self.timezone)
+        now = self._now()
+
+        while start + self.slot_duration <= day_end:
+            end = start + self.slot_duration
+            if start >= now and not any(s < end and e > start for s, e in busy):
+                slots.append(start)
+            start = end
+        return slots
+
+    def refresh(self) -> int:
+        """Re-read busy intervals for the window and patch the days that changed."""
+        today = self._now().date()
+        window_start = datetime.combine(today, time.min, tzinfo=self.timezone)
+        window_end = window_start + timedelta(days=self.days_ahead)
+        busy = self.calendar.get_busy(window_start, window_end)
+
+        with self._lock:
+            # pending bookings stay busy until the calendar reports them (or they pass).
+            now = self._now()
+            self._pending = {
+                start: end for start, end in self._pending.items()
+                if end > now and not any(s <= start and e >= end for s, e in busy)
+            }
+            busy = busy + list(self._pending.items())
+
+        days = {}
+        for offset in range(self.days_ahead):
+            day = today + timedelta(days=offset)
+            day_start = datetime.combine(day, time.min, tzinfo=self.timezone)
+            day_busy = [(s, e) for s, e in busy if s < day_start + timedelta(days=1) and e > day_start]
+            days[day] = self._day_slots(day, day_busy)
+
+        with self._lock:
+            # a booking made while the days were rebuilt is not in `busy`; keep it out.
+            days = {day: [slot for slot in slots if slot not in self._pending] for day, slots in days.items()}
+            changed = [day for day in days if self._days.get(day) != days[day]]
+            changed += [day for day in self._days if day not in days]
+
+            for day in changed:
+                day_start = datetime.combine(day, time.min, tzinfo=self.timezone)
+                lo = bisect.bisect_left(self._slots, day_start)
+                hi = bisect.bisect_left(self._slots, day_start + timedelta(days=1))
+                self._slots[lo:hi] = days.get(day, [])
+                if day in days:
+                    self._days[day] = days[day]
+                else:
+                    del self._days[day]
+            self.refreshed_at = self._now()
+
+        if changed:
+            logger.info(f"[SLOTS] Refreshed {len(changed)} day(s), {len(self._slots)} free slots")
+        return len(changed)
+
+    def free_slots(self, start: datetime = None, end: datetime = None, limit: int = None) -> List[datetime]:
+        start = self._normalize(start) if start else self._now()
+        end = self._normalize(end) if end else None
+        with self._lock:
+            lo = bisect.bisect_left(self._slots, start)
+            hi = bisect.bisect_left(self._slots, end) if end else len(self._slots)
+            slots = self._slots[lo:hi]
+        return slots[:limit] if limit else slots
+
+    def is_free(self, start: datetime) -> bool:
+        start = self._normalize(start)
+        with self._lock:
+            i = bisect.bisect_left(self._slots, start)
+            return i < len(self._slots) and self._slots[i] == start
+
+    def book(self, start: datetime) -> bool:
+        """Remove a slot from the index right after it is booked."""
+        start = self._normalize(start)
+        with self._lock:
+            i = bisect.bisect_left(self._slots, start)
+            if i >= len(self._slots) or self._slots[i] != start:
+                return False
+            del self._slots[i]
+
+            day_slots = self._days.get(start.date(), [])
+            if start in day_slots:
+                self._days[start.date()] = [slot for slot in day_slots if slot != start]
+            self._pending[start] = start + self.slot_duration
+        return True
+
+    def run_refresher(self, interval: float) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"[SLOTS] Failed to refresh slot index: {e}")
+            self._stopped.wait(interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+# slot indexes of this process by calendar id.
+_indexes: Dict[str, SlotIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def create_calendar(calendar_config: Dict[str, Any]):
+    """Busy lookup for `calendar_config`: Google Calendar, or `FakeCalendar` with CALENDAR_SLOT_SOURCE=fake."""
+    if os.getenv("CALENDAR_SLOT_SOURCE", "google").lower() == "fake":
+        return FakeCalendar()
+
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    credentials = Credentials.from_authorized_user_file(calendar_config["credentials"]["token"])
+    service = build("calendar", "v3", credentials=credentials, cache_discovery=False)
+    return GoogleCalendarBusy(service, calendar_config.get("id", "primary"))
+
+
+def start_slot_index(calendar_config: Dict[str, Any], interval: float = None) -> Optional[SlotIndex]:
+    """Build the slot index of a calendar and keep it refreshed in a background thread, once per process."""
+    calendar_id = calendar_config.get("id", "primary")
+    interval = interval if interval is not None else float(os.getenv("CALENDAR_SLOT_REFRESH", 300))
+
+    with _indexes_lock:
+        if calendar_id in _indexes:
+            return _indexes[calendar_id]
+        try:
+            index = SlotIndex(calendar_config, create_calendar(calendar_config))
+        except Exception as e:
+            logger.error(f"[SLOTS] Failed to create slot index for calendar {calendar_id}: {e}")
+            return None
+        _indexes[calendar_id] = index
+
+    threading.Thread(
+        target=index.run_refresher,
+        args=(interval,),
+        name=f"slot-index-{calendar_id}",
+        daemon=True,
+    ).start()
+    return index
+
+
+def get_slot_index(calendar_id: str = "primary") -> Optional[SlotIndex]:
+    return _indexes.get(calendar_id)
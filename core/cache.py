@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, List
+
+from core.logger import logger
+
+
+_MISSING = object()
+
+
+def estimate_size(value: Any, depth: int = 4, seen: set = None) -> int:
+    """Approximate retained size of `value` in bytes, following containers and object attributes."""
+    seen = seen if seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value, 0)
+    if depth <= 0 or isinstance(value, (str, bytes, bytearray, int, float, bool)):
+        return size
+
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k, depth - 1, seen) + estimate_size(v, depth - 1, seen)
+            for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, depth - 1, seen) for item in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), depth - 1, seen)
+    return size
+
+
+class Cache:
+    """
+    LRU cache bounded by entry count and bytes, with optional per-entry TTL.
+
+    Create caches through `caches.get_cache()` so they count against the worker memory
+    budget and show up in the admin endpoint.
+    """
+
+    def __init__(self, name: str, max_entries: int = 1024, max_bytes: int = None, ttl: float = None) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None, size: int = None) -> None:
+        size = size if size is not None else estimate_size(value)
+        ttl = ttl if ttl is not None else self.ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl if ttl else None)
+            self.bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                self.evict_one()
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: float = None) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def evict_one(self) -> bool:
+        with self._lock:
+            if not self._entries:
+                return False
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.stats["evictions"] += 1
+            return True
+
+    def flush(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+        return count
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self.bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats, entries, size = dict(self.stats), len(self._entries), self.bytes
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "entries": entries,
+            "bytes": size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+class CacheRegistry:
+    """Per-process registry of caches sharing one memory budget (`CACHE_MEMORY_BUDGET_MB`)."""
+
+    def __init__(self, budget_bytes: int = None) -> None:
+        self.budget_bytes = budget_bytes or int(float(os.getenv("CACHE_MEMORY_BUDGET_MB", 256)) * 1024 * 1024)
+        self._caches: Dict[str, Cache] = {}
+        self._lock = threading.Lock()
+        self._budget_lock = threading.Lock()
+
+    def get_cache(self, name: str, **kwargs) -> Cache:
+        with self._lock:
+            if name not in self._caches:
+                self._caches[name] = _BudgetedCache(self, name, **kwargs)
+                return self._caches[name]
+
+            cache = self._caches[name]
+        conflicts = {key: value for key, value in kwargs.items() if getattr(cache, key, value) != value}
+        if conflicts:
+            current = {key: getattr(cache, key) for key in conflicts}
+            logger.warning(f"[CACHE] Cache {name} already exists with {current}, ignoring {conflicts}")
+        return cache
+
+    def _snapshot(self) -> Dict[str, Cache]:
+        with self._lock:
+            return dict(self._caches)
+
+    def names(self) -> List[str]:
+        return list(self._snapshot())
+
+    def total_bytes(self) -> int:
+        return sum(cache.size_bytes() for cache in self._snapshot().values())
+
+    def enforce_budget(self) -> None:
+        # evict from the largest cache until the worker is back under budget.
+        with self._budget_lock:
+            registered = list(self._snapshot().values())
+            while registered and sum(cache.size_bytes() for cache in registered) > self.budget_bytes:
+                largest = max(registered, key=lambda cache: cache.size_bytes())
+                if not largest.evict_one():
+                    break
+
+    def flush(self, name: str = None) -> Dict[str, int]:
+        registered = self._snapshot()
+        if name is not None:
+            cache = registered.get(name)
+            flushed = {name: cache.flush()} if cache else {}
+        else:
+            flushed = {cache_name: cache.flush() for cache_name, cache in registered.items()}
+        logger.info(f"[CACHE] Flushed {flushed}")
+        return flushed
+
+    def get_stats(self) -> Dict[str, Any]:
+        registered = self._snapshot()
+        return {
+            "budget_bytes": self.budget_bytes,
+            "total_bytes": self.total_bytes(),
+            "caches": {name: cache.get_stats() for name, cache in registered.items()},
+        }
+
+
+class _BudgetedCache(Cache):
+
+    def __init__(self, registry: CacheRegistry, name: str, **kwargs) -> None:
+        super().__init__(name, **kwargs)
+        self.registry = registry
+
+    def set(self, key: Hashable, value: Any, ttl: float = None, size: int = None) -> None:
+        super().set(key, value, ttl=ttl, size=size)
+        self.registry.enforce_budget()
+
+
+caches = CacheRegistry()
+
+
+def get_cache(name: str, **kwargs) -> Cache:
+    return caches.get_cache(name, **kwargs)
@@ -0,0 +1,98 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from core.logger import logger
+
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+
+
+def sanitize_text(text: str) -> str:
+    if not text:
+        return text
+    text = EMAIL_PATTERN.sub("<email>", text)
+    return PHONE_PATTERN.sub("<phone>", text)
+
+
+def sanitize_value(value: Any) -> Any:
+    """Apply `sanitize_text` to every string inside nested dicts/lists."""
+    if isinstance(value, str):
+        return sanitize_text(value)
+    if isinstance(value, dict):
+        return {k: sanitize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [sanitize_value(v) for v in value]
+    return value
+
+
+def anonymize_id(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return hashlib.sha256(str(value).encode("utf-8")).hexdigest()[:16]
+
+
+class TraceRecorder:
+    """
+    Appends sanitized turn traces to a JSONL file for offline replay.
+
+    Capture is enabled by setting `CAPTURE_TRACE_PATH`; otherwise every call is a no-op.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path if path is not None else os.getenv("CAPTURE_TRACE_PATH")
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def record(
+        self,
+        source: str,
+        session_id: str,
+        smb_id: Optional[str],
+        user_input: str,
+        nodes: List[Dict[str, Any]],
+        output: str,
+        total_ms: float,
+        llm_calls: List[Dict[str, Any]] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+
+        trace = {
+            "timestamp": datetime.now().isoformat(),
+            "source": source,
+            "session": anonymize_id(session_id),
+            "smb_id": smb_id,
+            "input": sanitize_text(user_input),
+            "nodes": [sanitize_value(node) for node in nodes],
+            "llm_calls": [sanitize_value(call) for call in llm_calls or []],
+            "output": sanitize_text(output),
+            "total_ms": round(total_ms, 2),
+        }
+
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace, default=str) + "\n")
+        except Exception as e:
+            logger.error(f"[CAPTURE] Failed to write trace: {e}")
+
+
+def load_traces(path: str, source: str = None) -> List[Dict[str, Any]]:
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            trace = json.loads(line)
+            if source is None or trace.get("source") == source:
+                traces.append(trace)
+    return traces
@@ -0,0 +1,46 @@
+import time
+from uuid import UUID
+from typing import Dict, Any, List, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import message_to_dict
+from langchain_core.outputs import LLMResult
+
+
+class LLMCallRecorder(BaseCallbackHandler):
+    """
+    Collects the chat model outputs of one graph run for `TraceRecorder`.
+
+    Calls are kept in the order they started, which is the order the replay tool hands the
+    recorded outputs back to the graph.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._started: Dict[UUID, Tuple[int, float]] = {}
+        self._calls: List[Tuple[int, Dict[str, Any]]] = []
+        self._count = 0
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._started[run_id] = (self._count, time.perf_counter())
+        self._count += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        order, started = self._started.pop(run_id, (self._count, time.perf_counter()))
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        message = getattr(generation, "message", None)
+        if message is None:
+            return
+
+        self._calls.append((order, {
+            "message": message_to_dict(message),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._started.pop(run_id, None)
+
+    @property
+    def calls(self) -> List[Dict[str, Any]]:
+        return [call for _, call in sorted(self._calls, key=lambda item: item[0])]
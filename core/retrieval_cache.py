@@ -0,0 +1,169 @@
+import os
+import re
+import copy
+import json
+import hashlib
+import functools
+import threading
+import contextvars
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+
+from core.logger import logger
+from core.cache import Cache, get_cache
+
+if TYPE_CHECKING:
+    from neo4j import AsyncDriver
+
+
+# SMB of the turn being served, set by the entry points so graph queries can be cached per SMB.
+current_smb_id: contextvars.ContextVar = contextvars.ContextVar("current_smb_id", default=None)
+
+WRITE_CLAUSES = re.compile(r"\b(CREATE|MERGE|SET|DELETE|DETACH|REMOVE|DROP|FOREACH|LOAD\s+CSV)\b", re.IGNORECASE)
+
+
+class RetrievalCache:
+    """
+    Per-SMB cache of knowledge graph retrieval results.
+
+    Each SMB gets its own bounded LRU/TTL cache (`kg_retrieval:<smb_id>`) in the shared
+    registry, so one busy SMB cannot evict the others. Entries are keyed by normalized query
+    and a fingerprint of the Cypher query and its parameters.
+    Call `invalidate(smb_id)` after an SMB's knowledge base is re-ingested.
+    """
+
+    def __init__(self, max_entries_per_smb: int = None, ttl: float = None) -> None:
+        self.max_entries_per_smb = (
+            max_entries_per_smb if max_entries_per_smb is not None else int(os.getenv("KG_CACHE_MAX_ENTRIES", 256))
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("KG_CACHE_TTL", 3600))
+        self._caches: Dict[str, Cache] = {}
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def _cache(self, smb_id: str) -> Cache:
+        smb_id = str(smb_id)
+        with self._lock:
+            if smb_id not in self._caches:
+                self._caches[smb_id] = get_cache(
+                    f"kg_retrieval:{smb_id}", max_entries=self.max_entries_per_smb, ttl=self.ttl
+                )
+            return self._caches[smb_id]
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        query = re.sub(r"\s+", " ", (query or "").strip().lower())
+        return query.strip(" ?!.")
+
+    @staticmethod
+    def fingerprint(cypher: str, params: Dict[str, Any] = None) -> str:
+        payload = json.dumps({"cypher": cypher or "", "params": params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _key(self, query: str, cypher: str, params: Dict[str, Any]) -> tuple:
+        return (self.normalize_query(query), self.fingerprint(cypher, params))
+
+    def get(self, smb_id: str, query: str, cypher: str = "", params: Dict[str, Any] = None) -> Optional[List[Dict[str, Any]]]:
+        rows = self._cache(smb_id).get(self._key(query, cypher, params))
+        # callers get their own copy so they cannot change the cached rows.
+        return copy.deepcopy(rows) if rows is not None else None
+
+    def set(self, smb_id: str, query: str, rows: List[Dict[str, Any]], cypher: str = "", params: Dict[str, Any] = None) -> None:
+        self._cache(smb_id).set(self._key(query, cypher, params), copy.deepcopy(rows))
+
+    def invalidate(self, smb_id: str = None) -> None:
+        with self._lock:
+            if smb_id is None:
+                targets = list(self._caches.values())
+            else:
+                targets = [self._caches[str(smb_id)]] if str(smb_id) in self._caches else []
+            self.invalidations += 1
+        for cache in targets:
+            cache.flush()
+        logger.info(f"[KG CACHE] Invalidated retrieval cache for smb={smb_id or 'all'}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            smbs = {smb_id: cache.get_stats() for smb_id, cache in self._caches.items()}
+        hits = sum(stats["hits"] for stats in smbs.values())
+        misses = sum(stats["misses"] for stats in smbs.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": sum(stats["evictions"] for stats in smbs.values()),
+            "invalidations": self.invalidations,
+            "size": sum(stats["entries"] for stats in smbs.values()),
+            "max_entries_per_smb": self.max_entries_per_smb,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "smbs": smbs,
+        }
+
+
+retrieval_cache = RetrievalCache()
+
+_driver: Optional["AsyncDriver"] = None
+
+
+async def get_async_driver() -> "AsyncDriver":
+    """Shared async Neo4j driver (and connection pool) for the whole process."""
+    global _driver
+    if _driver is None:
+        from neo4j import AsyncGraphDatabase
+
+        _driver = AsyncGraphDatabase.driver(
+            os.getenv("NEO4J_URI"),
+            auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD")),
+            max_connection_pool_size=int(os.getenv("NEO4J_POOL_SIZE", 50)),
+        )
+    return _driver
+
+
+async def close_async_driver() -> None:
+    global _driver
+    if _driver is not None:
+        await _driver.close()
+        _driver = None
+
+
+async def cached_retrieval(smb_id: str, query: str, cypher: str, params: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    rows = retrieval_cache.get(smb_id, query, cypher, params)
+    if rows is not None:
+        return rows
+
+    driver = await get_async_driver()
+    records, _, _ = await driver.execute_query(
+        cypher,
+        parameters_=params or {},
+        database_=os.getenv("NEO4J_DATABASE"),
+    )
+    rows = [record.data() for record in records]
+    retrieval_cache.set(smb_id, query, rows, cypher, params)
+    return rows
+
+
+def install_graph_query_cache() -> None:
+    """
+    Serve read queries of `langchain_neo4j.Neo4jGraph` from the retrieval cache of the
+    current SMB. Writes, and queries outside a turn (no `current_smb_id`), go straight through.
+    """
+    from langchain_neo4j import Neo4jGraph
+
+    original = Neo4jGraph.query
+    if getattr(original, "retrieval_cached", False):
+        return
+
+    @functools.wraps(original)
+    def query(self, query: str, params: dict = None, *args, **kwargs) -> List[Dict[str, Any]]:
+        params = params or {}
+        smb_id = current_smb_id.get()
+        if smb_id is None or WRITE_CLAUSES.search(query):
+            return original(self, query, params, *args, **kwargs)
+
+        rows = retrieval_cache.get(smb_id, "", query, params)
+        if rows is None:
+            rows = original(self, query, params, *args, **kwargs)
+            retrieval_cache.set(smb_id, "", rows, query, params)
+        return rows
+
+    query.retrieval_cached = True
+    Neo4jGraph.query = query
+
@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from core.logger import logger
+
+
+class TurnClass:
+    VOICE = "voice"
+    CHAT = "chat"
+
+
+# Drop expired leases, then grant a slot if the shared and per-class limits allow it.
+# Chat is also refused while any voice turn is waiting, so voice always goes first.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+
+local voice = redis.call('ZCARD', KEYS[1])
+local chat = redis.call('ZCARD', KEYS[2])
+local own = ARGV[4] == 'voice' and voice or chat
+
+if voice + chat >= tonumber(ARGV[5]) or own >= tonumber(ARGV[6]) then
+    return 0
+end
+if ARGV[4] == 'chat' and redis.call('ZCARD', KEYS[3]) > 0 then
+    return 0
+end
+
+local key = ARGV[4] == 'voice' and KEYS[1] or KEYS[2]
+redis.call('ZADD', key, tonumber(ARGV[2]), ARGV[3])
+return 1
+"""
+
+# Join a waiting queue unless it already holds `max_queue` live entries.
+ENQUEUE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[1]))
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[2]), ARGV[3])
+return 1
+"""
+
+
+def redis_url() -> str:
+    url = os.getenv("REDIS_URL")
+    if url:
+        return url
+    password = os.getenv("REDIS_PASSWORD")
+    auth = f":{password}@" if password else ""
+    return (
+        f"redis://{auth}{os.getenv('REDIS_HOST', 'localhost')}:{os.getenv('REDIS_PORT', 6379)}"
+        f"/{os.getenv('REDIS_DB', 0)}"
+    )
+
+
+class AdmissionController:
+    """
+    Admission control in front of graph execution, shared by every API and voice process.
+
+    Running turns hold a lease in Redis out of `max_concurrency` shared slots, with per-class
+    limits. Turns that find no free slot wait in a per-class queue; while any voice turn
+    waits, new chat turns are held back. Chat turns are shed when the chat queue is full
+    (`CHAT_MAX_QUEUE`) or no slot frees up within `CHAT_MAX_WAIT`. Voice turns are never
+    shed: after `VOICE_MAX_WAIT` they run over the limit, still holding a lease.
+    Leases expire after `lease_seconds` so a crashed process cannot leak slots.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = None,
+        class_limits: Dict[str, int] = None,
+        max_wait: Dict[str, float] = None,
+        chat_max_queue: int = None,
+        lease_seconds: float = None,
+        prefix: str = "admission",
+    ) -> None:
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+        self.class_limits = class_limits or {
+            TurnClass.VOICE: int(os.getenv("VOICE_MAX_CONCURRENCY", self.max_concurrency)),
+            TurnClass.CHAT: int(os.getenv("CHAT_MAX_CONCURRENCY", self.max_concurrency)),
+        }
+        self.max_wait = max_wait or {
+            TurnClass.VOICE: float(os.getenv("VOICE_MAX_WAIT", 10.0)),
+            TurnClass.CHAT: float(os.getenv("CHAT_MAX_WAIT", 5.0)),
+        }
+        self.chat_max_queue = chat_max_queue or int(os.getenv("CHAT_MAX_QUEUE", self.max_concurrency * 2))
+        self.lease_seconds = lease_seconds or float(os.getenv("ADMISSION_LEASE_SECONDS", 300))
+        self.keys = {
+            TurnClass.VOICE: f"{prefix}:active:voice",
+            TurnClass.CHAT: f"{prefix}:active:chat",
+            "voice_waiting": f"{prefix}:waiting:voice",
+            "chat_waiting": f"{prefix}:waiting:chat",
+        }
+
+        self._redis: Optional[redis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._acquire = None
+        self._enqueue = None
+        self.stats = {
+            turn_class: {"admitted": 0, "shed": 0, "overflow": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for turn_class in (TurnClass.VOICE, TurnClass.CHAT)
+        }
+
+    def _client(self) -> redis.Redis:
+        # asyncio connections belong to one event loop; Streamlit runs a new loop per rerun.
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._redis = redis.from_url(redis_url())
+            self._acquire = self._redis.register_script(ACQUIRE_SCRIPT)
+            self._enqueue = self._redis.register_script(ENQUEUE_SCRIPT)
+            self._loop = loop
+        return self._redis
+
+    async def _try_acquire(self, turn_class: str, token: str) -> bool:
+        self._client()
+        now = time.time()
+        granted = await self._acquire(
+            keys=[self.keys[TurnClass.VOICE], self.keys[TurnClass.CHAT], self.keys["voice_waiting"]],
+            args=[now, now + self.lease_seconds, token, turn_class,
+                  self.max_concurrency, self.class_limits[turn_class]],
+        )
+        return bool(granted)
+
+    async def _wait(self, turn_class: str, token: str, started: float) -> Optional[bool]:
+        """Queue for a slot. Returns None if the queue is full, else whether a slot was granted."""
+        self._client()
+        waiting_key = self.keys[f"{turn_class}_waiting"]
+        max_wait = self.max_wait[turn_class]
+        max_queue = self.chat_max_queue if turn_class == TurnClass.CHAT else 1_000_000
+
+        now = time.time()
+        if not await self._enqueue(keys=[waiting_key], args=[now, now + max_wait, token, max_queue]):
+            return None
+
+        try:
+            delay = 0.01
+            while time.perf_counter() - started < max_wait:
+                await asyncio.sleep(delay)
+                if await self._try_acquire(turn_class, token):
+                    return True
+                delay = min(delay * 2, 0.1)
+            return False
+        finally:
+            await self._client().zrem(waiting_key, token)
+
+    def _record_wait(self, turn_class: str, wait_ms: float) -> None:
+        stats = self.stats[turn_class]
+        stats["admitted"] += 1
+        stats["wait_ms_total"] += wait_ms
+        stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+
+    async def acquire(self, turn_class: str) -> Optional[str]:
+        """Return a lease token, or None if the turn was shed."""
+        token = uuid.uuid4().hex
+        started = time.perf_counter()
+
+        try:
+            if await self._try_acquire(turn_class, token):
+                self._record_wait(turn_class, 0.0)
+                return token
+
+            # a waiting voice turn also keeps new chat turns out until it gets its slot.
+            granted = await self._wait(turn_class, token, started)
+            if granted:
+                self._record_wait(turn_class, (time.perf_counter() - started) * 1000)
+                return token
+
+            if turn_class == TurnClass.CHAT:
+                self.stats[turn_class]["shed"] += 1
+                reason = "queue full" if granted is None else "no slot within max wait"
+                logger.warning(f"[ADMISSION] Shedding chat turn: LLM pool saturated ({reason})")
+                return None
+
+            # never drop a live call: run over the limit rather than leave dead air, but keep
+            # the lease so every process counts this turn against the pool.
+            await self._client().zadd(self.keys[TurnClass.VOICE], {token: time.time() + self.lease_seconds})
+            self.stats[turn_class]["overflow"] += 1
+            logger.warning("[ADMISSION] Voice turn admitted over limit after waiting")
+            return token
+
+        except RedisError as e:
+            logger.error(f"[ADMISSION] Redis unavailable, admitting {turn_class} turn: {e}")
+            return token
+
+    async def release(self, turn_class: str, token: str) -> None:
+        try:
+            await self._client().zrem(self.keys[turn_class], token)
+        except RedisError as e:
+            logger.error(f"[ADMISSION] Failed to release {turn_class} slot: {e}")
+
+    @asynccontextmanager
+    async def admit(self, turn_class: str):
+        token = await self.acquire(turn_class)
+        try:
+            yield token is not None
+        finally:
+            if token is not None:
+                await self.release(turn_class, token)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        classes = {}
+        try:
+            client = self._client()
+            now = time.time()
+            active = {
+                turn_class: await client.zcount(self.keys[turn_class], now, "+inf")
+                for turn_class in (TurnClass.VOICE, TurnClass.CHAT)
+            }
+            waiting = {
+                turn_class: await client.zcount(self.keys[f"{turn_class}_waiting"], now, "+inf")
+                for turn_class in (TurnClass.VOICE, TurnClass.CHAT)
+            }
+        except RedisError as e:
+            logger.error(f"[ADMISSION] Failed to read pool state: {e}")
+            active, waiting = {}, {}
+
+        for turn_class, stats in self.stats.items():
+            admitted = stats["admitted"]
+            classes[turn_class] = {
+                **stats,
+                "active": active.get(turn_class),
+                "queue_depth": waiting.get(turn_class),
+                "wait_ms_avg": stats["wait_ms_total"] / admitted if admitted else 0.0,
+            }
+        return {"max_concurrency": self.max_concurrency, "classes": classes}
+
+
+admission_controller = AdmissionController()
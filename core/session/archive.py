@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import zlib
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, List, Optional
+
+import redis
+from redis.exceptions import RedisError
+
+from core.logger import logger
+from core.cache import get_cache
+from core.scheduling import redis_url
+from core.session.base import Session
+from core.session.backends.redis import RedisBackend
+
+
+# sweeper threads by archive path, one per process whatever the number of archive objects.
+_sweepers: Dict[str, threading.Thread] = {}
+_sweepers_lock = threading.Lock()
+
+
+def open_session(session_id: str) -> Session:
+    session = Session(RedisBackend())
+    session.set_session_id(session_id)
+    return session
+
+
+class SessionArchive:
+    """
+    Cold storage for session history kept in a local SQLite file.
+
+    Hot data stays in the session backend (Redis), capped to `max_hot_messages`, and every
+    Redis key of a session expires `session_ttl` seconds after its last turn. Older messages
+    and idle sessions are moved here as zlib-compressed JSON, their Redis keys are deleted,
+    and they are restored on the next access.
+    """
+
+    ARCHIVED_KEYS = ("messages", "app_context")
+
+    def __init__(self, path: str = None, max_hot_messages: int = None, session_ttl: int = None) -> None:
+        self.path = path or os.getenv("SESSION_ARCHIVE_PATH", "./storage/session_archive.db")
+        self.max_hot_messages = max_hot_messages or int(os.getenv("SESSION_MAX_HOT_MESSAGES", 50))
+        self.session_ttl = session_ttl or int(os.getenv("SESSION_TTL", 7 * 24 * 3600))
+        # backend keys of a session are found by SCAN, e.g. "*{session_id}*".
+        self.key_pattern = os.getenv("SESSION_KEY_PATTERN", "*{session_id}*")
+        self.session_keys = get_cache("session_keys", max_entries=4096, ttl=float(os.getenv("SESSION_KEY_RESCAN", 3600)))
+        self._redis: Optional[redis.Redis] = None
+        self.stats = {
+            "compactions": 0,
+            "evictions": 0,
+            "rehydrations": 0,
+            "reclaimed_bytes": 0,
+            "rehydration_ms": 0.0,
+            "ttl_set": 0,
+            "deleted_keys": 0,
+        }
+        # the database is created on first use, not when an entry point is imported.
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize_db()
+                    self._initialized = True
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _initialize_db(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with sqlite3.connect(self.path, timeout=10) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS archive ("
+                "session_id TEXT NOT NULL, key TEXT NOT NULL, payload BLOB NOT NULL, "
+                "archived_at TEXT NOT NULL, PRIMARY KEY (session_id, key))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, last_access TEXT NOT NULL, evicted INTEGER DEFAULT 0)"
+            )
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        return zlib.compress(json.dumps(value, default=str).encode("utf-8"))
+
+    @staticmethod
+    def _decode(payload: bytes) -> Any:
+        return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+    @staticmethod
+    def _size(value: Any) -> int:
+        return len(json.dumps(value, default=str).encode("utf-8"))
+
+    def _load(self, session_id: str, key: str) -> Optional[Any]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM archive WHERE session_id = ? AND key = ?", (session_id, key)
+            ).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def _store(self, session_id: str, key: str, value: Any) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO archive (session_id, key, payload, archived_at) VALUES (?, ?, ?, ?)",
+                (session_id, key, self._encode(value), datetime.now().isoformat()),
+            )
+
+    def _delete(self, session_id: str, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM archive WHERE session_id = ? AND key = ?", (session_id, key))
+
+    def _client(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(redis_url())
+        return self._redis
+
+    def _keys(self, session_id: str, rescan: bool = False) -> List[bytes]:
+        keys = None if rescan else self.session_keys.get(session_id)
+        if keys is None:
+            pattern = self.key_pattern.format(session_id=session_id)
+            keys = list(self._client().scan_iter(match=pattern, count=1000))
+            self.session_keys.set(session_id, keys)
+        return keys
+
+    @contextmanager
+    def session_lock(self, session_id: str, timeout: float = 10):
+        """Serialize writers of a session's history across processes. Yields False if the lock is unavailable."""
+        lock = self._client().lock(f"session_archive:lock:{session_id}", timeout=timeout, blocking_timeout=5)
+        try:
+            acquired = lock.acquire()
+        except RedisError as e:
+            logger.error(f"[ARCHIVE] Failed to lock session {session_id}: {e}")
+            acquired = False
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception as e:
+                    logger.warning(f"[ARCHIVE] Failed to release lock for session {session_id}: {e}")
+
+    def push(self, session: Session, session_id: str, key: str, value: Any) -> None:
+        """`session.push` under the session lock, so it cannot land inside a compaction."""
+        with self.session_lock(session_id):
+            session.push(key, value)
+
+    def expire(self, session_id: str) -> int:
+        """Set the session TTL on every Redis key of the session; call after each turn."""
+        keys = self._keys(session_id)
+        if keys:
+            pipe = self._client().pipeline()
+            for key in keys:
+                pipe.expire(key, self.session_ttl)
+            applied = pipe.execute()
+            if not all(applied):
+                # a key was deleted or renamed since the last scan.
+                self.session_keys.delete(session_id)
+        self.stats["ttl_set"] += len(keys)
+        return len(keys)
+
+    def touch(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_access, evicted) VALUES (?, ?, 0) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access, evicted = 0",
+                (session_id, datetime.now().isoformat()),
+            )
+
+    def compact(self, session: Session, session_id: str) -> int:
+        """Trim hot history to `max_hot_messages`, appending the overflow to the archive."""
+        with self.session_lock(session_id) as locked:
+            if not locked:
+                return 0
+
+            messages = session.get_data("messages") or []
+            if len(messages) <= self.max_hot_messages:
+                return 0
+
+            overflow = messages[:-self.max_hot_messages]
+            archived = self._load(session_id, "messages") or []
+            self._store(session_id, "messages", archived + overflow)
+            session.set_data("messages", messages[-self.max_hot_messages:])
+
+        reclaimed = self._size(overflow)
+        self.stats["compactions"] += 1
+        self.stats["reclaimed_bytes"] += reclaimed
+        logger.info(f"[ARCHIVE] Compacted {len(overflow)} messages for {session_id} ({reclaimed} bytes)")
+        return reclaimed
+
+    def evict(self, session: Session, session_id: str) -> int:
+        """Archive the history of an idle session and delete all of its Redis keys."""
+        reclaimed = 0
+
+        with self.session_lock(session_id) as locked:
+            if not locked:
+                return 0
+
+            messages = session.get_data("messages") or []
+            if messages:
+                archived = self._load(session_id, "messages") or []
+                self._store(session_id, "messages", archived + messages)
+                reclaimed += self._size(messages)
+
+            app_context = session.get_data("app_context")
+            if app_context is not None:
+                self._store(session_id, "app_context", app_context)
+                reclaimed += self._size(app_context)
+
+            # session, smb_id and last_access are rebuilt by the entry points on the next visit.
+            keys = self._keys(session_id, rescan=True)
+            if keys:
+                self._client().delete(*keys)
+            self.session_keys.delete(session_id)
+
+        with self._connect() as conn:
+            conn.execute("UPDATE sessions SET evicted = 1 WHERE session_id = ?", (session_id,))
+
+        self.stats["evictions"] += 1
+        self.stats["deleted_keys"] += len(keys)
+        self.stats["reclaimed_bytes"] += reclaimed
+        logger.info(f"[ARCHIVE] Evicted session {session_id} ({reclaimed} bytes, {len(keys)} keys)")
+        return reclaimed
+
+    def rehydrate(self, session: Session, session_id: str, key: str) -> Optional[Any]:
+        """Restore an archived key into the hot backend. Only the tail of `messages` is restored."""
+        if key not in self.ARCHIVED_KEYS:
+            return None
+
+        start = time.perf_counter()
+        value = self._load(session_id, key)
+        if value is None:
+            return None
+
+        if key == "messages":
+            hot = value[-self.max_hot_messages:]
+            cold = value[:-self.max_hot_messages]
+            if cold:
+                self._store(session_id, key, cold)
+            else:
+                self._delete(session_id, key)
+            value = hot
+        else:
+            self._delete(session_id, key)
+
+        session.set_data(key, value)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["rehydrations"] += 1
+        self.stats["rehydration_ms"] += elapsed_ms
+        logger.info(f"[ARCHIVE] Rehydrated {key} for {session_id} in {elapsed_ms:.2f}ms")
+        return value
+
+    def restore(self, session: Session, session_id: str) -> None:
+        """Mark the session active and bring back any archived key missing from the hot backend."""
+        self.touch(session_id)
+        if not session.get_data("messages"):
+            self.rehydrate(session, session_id, "messages")
+        if session.get_data("app_context") is None:
+            self.rehydrate(session, session_id, "app_context")
+
+    def purge(self, session_id: str) -> int:
+        """Drop a session everywhere: its Redis keys and its archived history."""
+        keys = self._keys(session_id, rescan=True)
+        if keys:
+            self._client().delete(*keys)
+        self.session_keys.delete(session_id)
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM archive WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return len(keys)
+
+    def cold_sessions(self, max_idle_seconds: int) -> List[str]:
+        cutoff = (datetime.now() - timedelta(seconds=max_idle_seconds)).isoformat()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT session_id FROM sessions WHERE evicted = 0 AND last_access < ?", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def sweep(self, session_factory: Callable[[str], Session], max_idle_seconds: int) -> int:
+        """Evict every session idle for longer than `max_idle_seconds`."""
+        reclaimed = 0
+        for session_id in self.cold_sessions(max_idle_seconds):
+            try:
+                reclaimed += self.evict(session_factory(session_id), session_id)
+            except Exception as e:
+                logger.error(f"[ARCHIVE] Failed to evict session {session_id}: {e}")
+        return reclaimed
+
+    def _run_sweeper(self, session_factory: Callable[[str], Session], interval: int, max_idle: int) -> None:
+        # one sweeper per archive file: workers sharing it take turns through a Redis lock
+        # that lapses after one interval, so a dead worker never blocks the sweep.
+        lock_key = f"session_archive:sweeper:{socket.gethostname()}:{os.path.abspath(self.path)}"
+        while True:
+            time.sleep(interval)
+            try:
+                if not self._client().set(lock_key, os.getpid(), nx=True, ex=interval):
+                    continue
+                reclaimed = self.sweep(session_factory, max_idle)
+                logger.info(f"[ARCHIVE] Sweep reclaimed {reclaimed} bytes, stats: {self.get_stats()}")
+            except Exception as e:
+                logger.error(f"[ARCHIVE] Sweep failed: {e}")
+
+    def start_sweeper(self, session_factory: Callable[[str], Session] = open_session) -> None:
+        """Start the idle session sweeper in a background thread, once per process."""
+        interval = int(os.getenv("SESSION_ARCHIVE_INTERVAL", 300))
+        max_idle = int(os.getenv("SESSION_MAX_IDLE", 3600))
+
+        with _sweepers_lock:
+            if self.path in _sweepers:
+                return
+            _sweepers[self.path] = threading.Thread(
+                target=self._run_sweeper,
+                args=(session_factory, interval, max_idle),
+                name="session-archive-sweeper",
+                daemon=True,
+            )
+            _sweepers[self.path].start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        rehydrations = stats["rehydrations"]
+        stats["avg_rehydration_ms"] = stats["rehydration_ms"] / rehydrations if rehydrations else 0.0
+        return stats
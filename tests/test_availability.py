@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from core.availability import FakeCalendar, SlotIndex
+
+
+TZ = ZoneInfo("Asia/Kolkata")
+NOW = datetime(2030, 1, 7, 8, 0, tzinfo=TZ)  # a Monday, before opening time
+
+CALENDAR = {
+    "id": "primary",
+    "timezone": "Asia/Kolkata",
+    "availability": {
+        "start": "09:00",
+        "end": "17:00",
+        "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"],
+    },
+    "slot_duration": 60,
+}
+
+
+def at(day: int, hour: int) -> datetime:
+    return datetime(2030, 1, 7 + day, hour, 0, tzinfo=TZ)
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar()
+
+
+@pytest.fixture
+def index(calendar):
+    index = SlotIndex(CALENDAR, calendar, days_ahead=7)
+    index._now = lambda: NOW
+    index.refresh()
+    return index
+
+
+def test_refresh_builds_slots_from_availability(index):
+    slots = index.free_slots()
+
+    assert slots[0] == at(0, 9)
+    assert slots[7] == at(0, 16)
+    # five working days of eight one-hour slots, weekend excluded.
+    assert len(slots) == 5 * 8
+    assert not index.free_slots(at(5, 0), at(7, 0))
+
+
+def test_refresh_excludes_busy_intervals(calendar, index):
+    calendar.book(at(1, 10), at(1, 12))
+
+    assert index.refresh() == 1
+    assert not index.is_free(at(1, 10))
+    assert not index.is_free(at(1, 11))
+    assert index.is_free(at(1, 12))
+
+
+def test_refresh_patches_only_changed_days(calendar, index):
+    assert index.refresh() == 0
+
+    calendar.book(at(2, 9), at(2, 10))
+    assert index.refresh() == 1
+    assert index.refresh() == 0
+
+
+def test_book_removes_slot_immediately(index):
+    assert index.book(at(0, 9))
+    assert not index.is_free(at(0, 9))
+    assert not index.book(at(0, 9))
+
+
+def test_pending_booking_survives_refresh_until_calendar_reports_it(calendar, index):
+    index.book(at(0, 10))
+
+    # the calendar has not caught up yet.
+    index.refresh()
+    assert not index.is_free(at(0, 10))
+    assert at(0, 10) in index._pending
+
+    calendar.book(at(0, 10), at(0, 11))
+    index.refresh()
+    assert not index.is_free(at(0, 10))
+    assert at(0, 10) not in index._pending
+
+
+def test_booking_during_refresh_is_not_overwritten(calendar, index):
+    day_slots = index._day_slots
+    booked = []
+
+    def book_while_rebuilding(day, busy):
+        # book in the window between reading the calendar and writing the new days.
+        if not booked:
+            booked.append(index.book(at(0, 13)))
+        return day_slots(day, busy)
+
+    index._day_slots = book_while_rebuilding
+    index.refresh()
+
+    assert booked == [True]
+    assert not index.is_free(at(0, 13))
+
+
+def test_naive_datetimes_are_calendar_local(index):
+    assert index.is_free(datetime(2030, 1, 7, 9, 0))
+    assert index.book(datetime(2030, 1, 7, 9, 0))
+    assert not index.is_free(at(0, 9))
+
+
+def test_aware_datetimes_are_converted(index):
+    utc_slot = at(0, 10).astimezone(ZoneInfo("UTC"))
+
+    assert index.is_free(utc_slot)
+    assert index.free_slots(utc_slot, limit=1) == [at(0, 10)]
+    assert index.free_slots(utc_slot, limit=1)[0].tzinfo == TZ